@@ -1,80 +1,198 @@
 import os
 import re
+import math
 import time
+import random
 import logging
+import atexit
+import queue
+from logging.handlers import QueueHandler, QueueListener
+import orjson
 import requests
-from datetime import datetime
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import csv
 import io
-
-# Logging setup
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+
+# Logging setup: records are queued on the calling thread and written to
+# stderr by a background listener, so lookup workers never block on the stream
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_listener = QueueListener(queue.SimpleQueue(), _log_handler)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler()]
+    format='%(message)s',  # the listener's handler adds timestamp and level
+    handlers=[QueueHandler(_log_listener.queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
+# The format never uses thread or process fields, so skip looking them up per record
+logging.logThreads = False
+logging.logProcesses = False
 
 # Configuration from env
 MARKUP_MULTIPLIER = float(os.getenv('MARKUP_MULTIPLIER', 2.8))
 MIN_MARGIN_THRESHOLD = float(os.getenv('MIN_MARGIN_THRESHOLD', 0.3))
 MAX_CANDIDATES_PER_RUN = int(os.getenv('MAX_CANDIDATES_PER_RUN', 10))
 RUN_MODE = os.getenv('RUN_MODE', 'once')
+SYNC_INTERVAL_MINUTES = float(os.getenv('SYNC_INTERVAL_MINUTES', 10))
 MAKRO_APP_ID = os.getenv('MAKRO_API_KEY', '')
 MAKRO_APP_SECRET = os.getenv('MAKRO_API_SECRET', '')
 DRY_RUN = os.getenv('DRY_RUN', '1') == '1'
 GOOGLE_SHEETS_CSV_URL = os.getenv('GOOGLE_SHEETS_CSV_URL', '')
 MODE = os.getenv('MODE', 'ingest')
+MAKRO_LOCATION_ID = os.getenv('MAKRO_LOCATION_ID', 'LOC4cef7f9b88a14df79646ba1c9dca25e9')
+LISTINGS_PER_REQUEST = int(os.getenv('LISTINGS_PER_REQUEST', 50))
+PREWARM = os.getenv('PREWARM', '1') == '1'
+REVIEW_QUEUE_CACHE_TTL = 30  # seconds
+LISTED_SKUS_FILE = os.getenv('LISTED_SKUS_FILE', 'listed_skus.json')
+MAKRO_API_BASE_URL = 'https://seller.makro.co.za/api'
+MAKRO_TOKEN_CACHE = os.getenv('MAKRO_TOKEN_CACHE', '')
+FSN_LOOKUP_WORKERS = 8
+MAKRO_THROTTLE_RETRIES = 3
+MAKRO_THROTTLE_MAX_WAIT = 60  # seconds
+
+MAKRO_SEARCH_URL = 'https://www.makro.co.za/search'
+MAKRO_SEARCH_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)',
+    'Accept': 'text/html',
+}
+FSN_RE = re.compile(rb'pid=([A-Z0-9]{13,16})')
+FSN_SCAN_CHUNK_SIZE = 64 * 1024
+FSN_CACHE_TTL = 3600  # seconds
+FSN_CACHE_SIZE = 4096
+# Currency symbol and thousands separators are dropped from sheet amounts
+PRICE_TRANS = str.maketrans('', '', 'R,')
+# Whitespace control characters become spaces; punctuation that only adds search noise is dropped
+TITLE_TRANS = str.maketrans('\t\n\r', '   ', '!?,"\'()')
+
+# One pooled session for all Makro, Google Sheets and search traffic so
+# connections and TLS sessions are reused between calls
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=1.0,
+        backoff_max=30,
+        backoff_jitter=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+))
+
+
+def prewarm_connections(urls):
+    """Open pooled connections to the given hosts on a background thread"""
+    def warm():
+        for url in urls:
+            try:
+                SESSION.head(url, timeout=5)
+            except Exception:
+                pass
+
+    threading.Thread(target=warm, daemon=True).start()
 
 
 def to_float(value, default=0.0):
     """Safely parse float from string, handling commas and currency symbols"""
     try:
-        s = (value or '').strip().replace('R', '').replace(',', '')
+        s = (value or '').translate(PRICE_TRANS).strip()
         return float(s) if s else default
     except Exception:
         return default
 
 
+def to_price(value, default=0.0):
+    """Parse a rand amount from text and round it to whole cents (half up)"""
+    try:
+        s = (value or '').translate(PRICE_TRANS).strip()
+        return float(Decimal(s).quantize(Decimal('0.01'), ROUND_HALF_UP)) if s else default
+    except Exception:
+        return default
+
+
+def normalize_title(title):
+    """Clean a product title into a case-folded search query"""
+    title = title.replace('DH - ', '').replace('Cappuccino', '')
+    return ' '.join(title.translate(TITLE_TRANS).casefold().split())
+
+
+def scan_for_fsn(chunks):
+    """Return the first FSN in a stream of page chunks, reading no further"""
+    buf = b''
+    for chunk in chunks:
+        buf += chunk
+        match = FSN_RE.search(buf)
+        # A match that touches the end of the buffer may continue in the next chunk
+        if match and match.end() < len(buf):
+            return match.group(1).decode()
+        buf = buf[-32:]
+
+    match = FSN_RE.search(buf)
+    return match.group(1).decode() if match else None
+
+
 class MakroFSNFinder:
     """Automatically find FSN IDs by searching Makro's website"""
 
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
-        })
+        # Normalized search query -> (fetched at, FSN or None), shared by lookup workers
+        self._cache = {}
+        self._cache_lock = threading.Lock()
 
     def search_makro(self, product_title):
         try:
-            search_query = (
-                product_title
-                .replace('DH - ', '')
-                .replace('Cappuccino', '')
-                .strip()
-            )
-
-            logger.info(f"Searching Makro for: {search_query}")
-
-            search_url = f"https://www.makro.co.za/search?q={requests.utils.quote(search_query)}"
-            resp = self.session.get(search_url, timeout=30)
-            resp.raise_for_status()
-
-            fsn_matches = re.findall(r'pid=([A-Z0-9]{13,16})', resp.text)
-
-            if fsn_matches:
-                fsn = list(dict.fromkeys(fsn_matches))[0]
-                logger.info(f"  ✅ Found FSN: {fsn}")
+            search_query = normalize_title(product_title)
+
+            with self._cache_lock:
+                cached = self._cache.get(search_query)
+            if cached and time.time() - cached[0] < FSN_CACHE_TTL:
+                return cached[1]
+
+            logger.info("Searching Makro for: %s", search_query)
+
+            # Only the first product id is used, so stop downloading once it is seen
+            with SESSION.get(
+                MAKRO_SEARCH_URL,
+                params={'q': search_query},
+                headers=MAKRO_SEARCH_HEADERS,
+                timeout=30,
+                stream=True
+            ) as resp:
+                resp.raise_for_status()
+                fsn = scan_for_fsn(resp.iter_content(chunk_size=FSN_SCAN_CHUNK_SIZE))
+
+            with self._cache_lock:
+                if search_query not in self._cache and len(self._cache) >= FSN_CACHE_SIZE:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[search_query] = (time.time(), fsn)
+
+            if fsn:
+                logger.info("  ✅ Found FSN: %s", fsn)
                 return fsn
 
-            logger.warning(f"  ⚠️ No FSN found for: {product_title}")
+            logger.warning("  ⚠️ No FSN found for: %s", product_title)
             return None
 
         except Exception as e:
-            logger.error(f"Error searching Makro: {e}")
+            logger.error("Error searching Makro: %s", e)
             return None
 
+    def is_known_miss(self, product_title):
+        """True if a recent search for this title found no FSN"""
+        with self._cache_lock:
+            cached = self._cache.get(normalize_title(product_title))
+        return bool(cached) and cached[1] is None and time.time() - cached[0] < FSN_CACHE_TTL
+
 
 class MakroAuth:
     def __init__(self, app_id, app_secret):
@@ -82,15 +200,62 @@ class MakroAuth:
         self.app_secret = app_secret
         self.token = None
         self.expiry = 0
-        self.token_url = 'https://seller.makro.co.za/api/oauth-service/oauth/token'
+        self.token_url = f'{MAKRO_API_BASE_URL}/oauth-service/oauth/token'
+
+    def _load_cached_token(self):
+        """Pick up a still-valid token persisted by a previous process"""
+        if not MAKRO_TOKEN_CACHE:
+            return False
+
+        try:
+            with open(MAKRO_TOKEN_CACHE, 'rb') as f:
+                data = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return False
+
+        if not isinstance(data, dict) or data.get('app_id') != self.app_id:
+            return False
+
+        try:
+            token = data['access_token']
+            expiry = float(data['expiry'])
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        if not isinstance(token, str) or time.time() >= expiry:
+            return False
+
+        self.token = token
+        self.expiry = expiry
+        return True
+
+    def _save_cached_token(self):
+        if not MAKRO_TOKEN_CACHE:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(MAKRO_TOKEN_CACHE) or '.', exist_ok=True)
+            fd = os.open(MAKRO_TOKEN_CACHE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps({
+                    'app_id': self.app_id,
+                    'access_token': self.token,
+                    'expiry': self.expiry,
+                }))
+        except OSError as e:
+            logger.warning("Could not persist OAuth token: %s", e)
 
     def get_token(self):
         if self.token and time.time() < self.expiry:
             return self.token
 
+        if self._load_cached_token():
+            logger.info("Reusing cached OAuth token")
+            return self.token
+
         logger.info("Fetching new OAuth access token...")
 
-        resp = requests.get(
+        resp = SESSION.get(
             self.token_url,
             params={
                 'grant_type': 'client_credentials',
@@ -101,9 +266,10 @@ class MakroAuth:
         )
         resp.raise_for_status()
 
-        data = resp.json()
+        data = orjson.loads(resp.content)
         self.token = data['access_token']
         self.expiry = time.time() + data.get('expires_in', 3600) - 60
+        self._save_cached_token()
 
         logger.info("Successfully obtained OAuth token")
         return self.token
@@ -112,8 +278,7 @@ class MakroAuth:
 class MakroApi:
     def __init__(self, auth: MakroAuth):
         self.auth = auth
-        self.base_url = 'https://seller.makro.co.za/api'
-        self.session = requests.Session()
+        self.base_url = MAKRO_API_BASE_URL
 
     def _headers(self):
         return {
@@ -125,75 +290,194 @@ class MakroApi:
     def _request(self, method, endpoint, json_body=None):
         url = f"{self.base_url}{endpoint}"
 
-        resp = self.session.request(
-            method,
-            url,
-            headers=self._headers(),
-            json=json_body,
-            timeout=30,
-            allow_redirects=False
-        )
+        # Dry runs never send mutations, so skip the token fetch and body encoding
+        if DRY_RUN and method != 'GET':
+            logger.info("[DRY RUN] Skipping %s %s", method, url)
+            # Mirror the bulk listing response so callers see every record succeed
+            return {'results': [
+                {'sku_id': record.get('sku_id'), 'status': 'SUCCESS', 'listing_id': 'dry-run'}
+                for record in (json_body or {}).get('listing_records', [])
+            ]}
+
+        body = orjson.dumps(json_body) if json_body is not None else None
+
+        # SESSION's Retry only resends idempotent methods. A 429 is refused before any
+        # processing, so a throttled POST is safe to resend; 5xx and timeouts are not.
+        for attempt in range(MAKRO_THROTTLE_RETRIES + 1):
+            resp = SESSION.request(
+                method,
+                url,
+                headers=self._headers(),
+                data=body,
+                timeout=30,
+                allow_redirects=False
+            )
+            if resp.status_code != 429 or method == 'GET' or attempt == MAKRO_THROTTLE_RETRIES:
+                break
+
+            try:
+                wait = float(resp.headers.get('Retry-After', ''))
+            except ValueError:
+                wait = math.nan
+            if not math.isfinite(wait):
+                wait = 2 ** attempt + random.random()
+            wait = min(max(wait, 0), MAKRO_THROTTLE_MAX_WAIT)
+            logger.warning("HTTP 429: %s %s, retrying in %.1fs", method, url, wait)
+            time.sleep(wait)
 
         # Check for redirects (3xx status codes)
         if 300 <= resp.status_code < 400:
-            logger.error(f"REDIRECT: {resp.status_code} {method} {url}")
-            logger.error(f"Location: {resp.headers.get('Location')}")
+            logger.error("REDIRECT: %s %s %s", resp.status_code, method, url)
+            logger.error("Location: %s", resp.headers.get('Location'))
             raise RuntimeError("Makro API redirected to a different host. Blocked for safety")
 
         if resp.status_code >= 400:
-            logger.error(f"HTTP {resp.status_code}: {method} {url}")
-            logger.error(f"Body: {resp.text[:10000]}")
+            logger.error("HTTP %s: %s %s", resp.status_code, method, url)
+            logger.error("Body: %s", resp.text[:10000])
             resp.raise_for_status()
 
-        return resp.json() if resp.text else None
+        return orjson.loads(resp.content) if resp.content else None
 
     def create_listing(self, payload):
         """Create a new listing"""
         return self._request('POST', '/listings/v5/', json_body=payload)
 
+    def create_listings_bulk(self, payloads):
+        """Create several listings in a single request"""
+        records = [record for payload in payloads for record in payload['listing_records']]
+        return self._request('POST', '/listings/v5/', json_body={'listing_records': records})
+
+
+@dataclass(slots=True)
+class ApprovedItem:
+    """A reviewed row from the candidates sheet"""
+    takealot_sku: str
+    fsn: str
+    title: str
+    takealot_price: float
+    suggested_price: float
+    margin: float
+
 
 class ReviewQueue:
     def __init__(self, csv_url):
         self.csv_url = csv_url
+        self._cache = None
+        self._cache_ts = 0
+        # Conditional request headers and rows from the last full download
+        self._validators = {}
+        self._last_parsed = None
+        # SKUs already listed on Makro, kept across restarts
+        self._listed = self._load_listed()
+
+    def _load_listed(self):
+        try:
+            with open(LISTED_SKUS_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
+            # Expected on a first run, but after a redeploy it means every approved row gets listed again
+            if not DRY_RUN:
+                logger.warning(
+                    "No listed-SKU store at %s, so all approved rows count as unlisted. "
+                    "Point LISTED_SKUS_FILE at a persistent volume.", LISTED_SKUS_FILE
+                )
+            return set()
+        except (OSError, orjson.JSONDecodeError):
+            return set()
+
+        if not isinstance(data, list) or not all(isinstance(sku, str) for sku in data):
+            logger.warning("Ignoring %s: expected a JSON list of SKUs", LISTED_SKUS_FILE)
+            return set()
+
+        return set(data)
+
+    def _save_listed(self):
+        # Write a temp file and swap it in so a crash never leaves a truncated file
+        tmp_path = f'{LISTED_SKUS_FILE}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(sorted(self._listed)))
+            os.replace(tmp_path, LISTED_SKUS_FILE)
+        except OSError as e:
+            logger.warning("Could not persist listed SKUs: %s", e)
+
+    def _parse_approved(self, text):
+        # Read plain rows and only build records for approved ones
+        rows = csv.reader(io.StringIO(text))
+        columns = {name.strip(): i for i, name in enumerate(next(rows, []))}
+
+        def cell(row, name):
+            i = columns.get(name)
+            return row[i].strip() if i is not None and i < len(row) else ''
+
+        approved = []
+
+        for row in rows:
+            if not row:
+                continue
+
+            status = cell(row, 'Status').lower()
+            sku = cell(row, 'Takealot SKU')
+
+            logger.info("Row: SKU=%s Status=%s", sku, status)
+
+            if status in ('approved', 'candidate'):
+                approved.append(ApprovedItem(
+                    takealot_sku=sku,
+                    fsn=cell(row, 'FSN'),
+                    title=cell(row, 'Title'),
+                    takealot_price=to_price(cell(row, 'Takealot Price')),
+                    suggested_price=to_price(cell(row, 'Suggested Makro Price')),
+                    margin=to_float(cell(row, 'Margin %')),
+                ))
+
+        return approved
 
     def get_approved_items(self):
         if not self.csv_url:
             logger.error("GOOGLE_SHEETS_CSV_URL not configured")
             return []
 
+        # Reuse the last parse when called again within the same job
+        if self._cache is not None and time.time() - self._cache_ts < REVIEW_QUEUE_CACHE_TTL:
+            return self._cache
+
         try:
             logger.info("Fetching candidate items from Google Sheets...")
-            resp = requests.get(self.csv_url, timeout=30)
-            resp.raise_for_status()
-
-            csv_data = csv.DictReader(io.StringIO(resp.text))
-            approved = []
-
-            for row in csv_data:
-                status = row.get('Status', '').strip().lower()
-                sku = row.get('Takealot SKU', '').strip()
-
-                logger.info(f"Row: SKU={sku} Status={status}")
-
-                if status in ['approved', 'candidate']:
-                    approved.append({
-                        'takealot_sku': sku,
-                        'fsn': row.get('FSN', '').strip(),
-                        'title': row.get('Title', '').strip(),
-                        'takealot_price': to_float(row.get('Takealot Price')),
-                        'suggested_price': to_float(row.get('Suggested Makro Price')),
-                        'margin': to_float(row.get('Margin %')),
-                    })
-
-            logger.info(f"Found {len(approved)} approved items")
+            resp = SESSION.get(self.csv_url, headers=self._validators, timeout=30)
+
+            if resp.status_code == 304 and self._last_parsed is not None:
+                logger.info("Sheet unchanged since last fetch")
+                approved = self._last_parsed
+            else:
+                resp.raise_for_status()
+                approved = self._parse_approved(resp.text)
+                self._last_parsed = approved
+                self._validators = {}
+                if resp.headers.get('ETag'):
+                    self._validators['If-None-Match'] = resp.headers['ETag']
+                if resp.headers.get('Last-Modified'):
+                    self._validators['If-Modified-Since'] = resp.headers['Last-Modified']
+
+            # Rows stay approved in the sheet after listing, so drop the ones already done
+            approved = [item for item in approved if item.takealot_sku not in self._listed]
+
+            logger.info("Found %d approved items", len(approved))
+            self._cache = approved
+            self._cache_ts = time.time()
             return approved
 
         except Exception as e:
-            logger.error(f"Failed to fetch approved items: {e}")
+            logger.error("Failed to fetch approved items: %s", e)
             return []
 
-    def mark_as_listed(self, takealot_sku, listing_id):
-        logger.info(f"Would mark {takealot_sku} as listed with Makro listing {listing_id}")
+    def mark_as_listed(self, listings):
+        """Record a batch of Takealot SKU -> Makro listing ID, then rewrite the file once"""
+        self._cache = None
+        for takealot_sku, listing_id in listings.items():
+            self._listed.add(takealot_sku)
+            logger.info("Recorded %s as listed with Makro listing %s", takealot_sku, listing_id)
+        self._save_listed()
 
 
 class TakealotScraper:
@@ -212,8 +496,8 @@ def ingest_mode(makro_api, takealot_scraper):
 
 
 def build_makro_listing(fsn: str, sku: str, price: float, location_id: str, inventory: int = 10):
-        """Build Makro SA v5 API listing payload (snake_case as per Seller API guide)"""
-        return {
+    """Build Makro SA v5 API listing payload (snake_case as per Seller API guide)"""
+    return {
         "listing_records": [{
             "product_id": fsn,
             "listing_status": "ACTIVE",
@@ -250,18 +534,17 @@ def build_makro_listing(fsn: str, sku: str, price: float, location_id: str, inve
                     "fragile": False
                 }
             }],
-                "locations": [{
-                                        "id": location_id,
-                    "status": "Active",
-                    "inventory": inventory
-                                    }]
-                        }]
-                    }
-                }
-                
+            "locations": [{
+                "id": location_id,
+                "status": "Active",
+                "inventory": inventory
+            }]
+        }]
+    }
+
 
 def activate_mode(makro_api, review_queue, takealot_scraper, fsn_finder):
-        """Process approved items and create Makro listings"""
+    """Process approved items and create Makro listings"""
 
     # Safety check for missing API credentials
     if not makro_api and not DRY_RUN:
@@ -272,96 +555,228 @@ def activate_mode(makro_api, review_queue, takealot_scraper, fsn_finder):
     if not approved_items:
         logger.info("No approved items to process")
         return
-    
-    for item in approved_items:
-        sku = item['takealot_sku']
-        title = item['title']
-                price = item['suggested_price']
-        fsn = item['fsn']
 
-        logger.info(f"\n{'=' * 60}")
-        logger.info(f"Processing SKU={sku}")
-        logger.info(f"Title: {title}")
-        logger.info(f"Price: R{price}")
-
-        # Skip items with invalid price
-        if price <= 0:
-            logger.warning(f"Outcome=SKIPPED reason=INVALID_PRICE SKU={sku}")
-            continue
-
-        # Auto-find FSN if missing
-        if not fsn:
-            logger.info("FSN not provided, searching Makro...")
-            fsn = fsn_finder.search_makro(title)
-            if not fsn:
-                logger.warning("Outcome=SKIPPED reason=NO_FSN")
-                continue
+    # Listings are collected and sent in batches after the loop
+    pending = []
+    seen_skus = set()
+    # Rows without an FSN wait until the rows that need no search are in
+    needs_fsn = []
 
+    def accept(sku, fsn, price):
         payload = build_makro_listing(
             fsn=fsn,
             sku=sku,
             price=price,
-            location_id=os.getenv('MAKRO_LOCATION_ID', 'LOC4cef7f9b88a14df79646ba1c9dca25e9')
+            location_id=MAKRO_LOCATION_ID
         )
 
         if DRY_RUN:
-            logger.info(f"[DRY RUN] Would create listing with payload: {json.dumps(payload, indent=2)}")
-            logger.info("Outcome=DRY_RUN_SUCCESS")
+            # Rendering the payload is the costly part, so skip it when INFO is filtered
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "[DRY RUN] Would create listing with payload: %s",
+                    orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+                )
+            logger.info("Outcome=DRY_RUN_SUCCESS SKU=%s", sku)
         else:
-            try:
-                logger.info("Creating Makro listing...")
-                result = makro_api.create_listing(payload) or {}
-                listing_id = result.get('listing_id', 'unknown')
-                logger.info("✅ Successfully created listing")
-                logger.info(f"Listing ID: {listing_id}")
-                logger.info(f"Outcome=CREATED listing_id={listing_id}")
+            pending.append((sku, payload))
+        seen_skus.add(sku)
 
-                review_queue.mark_as_listed(sku, listing_id)
+    for item in approved_items:
+        # Only accepted rows count toward the cap, so skipped rows cannot starve later ones
+        if len(seen_skus) >= MAX_CANDIDATES_PER_RUN:
+            break
+
+        sku = item.takealot_sku
+        title = item.title
+        price = item.suggested_price
+
+        logger.info("\n%s", '=' * 60)
+        logger.info("Processing SKU=%s", sku)
+        logger.info("Title: %s", title)
+        logger.info("Price: R%s", price)
+
+        # A repeated SKU in one batch would get the whole request rejected;
+        # only rows that were actually accepted count, so a corrected row can follow a bad one
+        if sku in seen_skus:
+            logger.warning("Outcome=SKIPPED reason=DUPLICATE_SKU SKU=%s", sku)
+            continue
 
-            except Exception as e:
-                logger.error(f"❌ Failed to create listing: {e}")
-                logger.error(f"Outcome=FAILED error={str(e)[:200]}")
+        # Skip items with invalid price
+        if price <= 0:
+            logger.warning("Outcome=SKIPPED reason=INVALID_PRICE SKU=%s", sku)
+            continue
+
+        if not item.fsn:
+            # Titles Makro recently had nothing for would just burn the search budget again
+            if fsn_finder.is_known_miss(title):
+                logger.warning("Outcome=SKIPPED reason=NO_FSN SKU=%s", sku)
+                continue
+            logger.info("FSN not provided, queued for Makro search")
+            needs_fsn.append(item)
+            continue
+
+        accept(sku, item.fsn, price)
+
+    # Search pages are independent, so fetch them concurrently, but only as many
+    # as there is still room for; misses get another round until the budget runs out
+    searches_left = MAX_CANDIDATES_PER_RUN * 3
+    found_fsns = {}
+    with ThreadPoolExecutor(max_workers=FSN_LOOKUP_WORKERS) as pool:
+        while needs_fsn and len(seen_skus) < MAX_CANDIDATES_PER_RUN and searches_left > 0:
+            room = min(MAX_CANDIDATES_PER_RUN - len(seen_skus), searches_left)
+            titles = list(islice(
+                dict.fromkeys(item.title for item in needs_fsn if item.title not in found_fsns),
+                room
+            ))
+            logger.info("Searching Makro for %d missing FSNs...", len(titles))
+            found_fsns.update(zip(titles, pool.map(fsn_finder.search_makro, titles)))
+            searches_left -= len(titles)
+
+            unresolved = []
+            for item in needs_fsn:
+                sku = item.takealot_sku
+                if item.title not in found_fsns:
+                    unresolved.append(item)
+                elif len(seen_skus) >= MAX_CANDIDATES_PER_RUN:
+                    break
+                elif sku in seen_skus:
+                    logger.warning("Outcome=SKIPPED reason=DUPLICATE_SKU SKU=%s", sku)
+                elif not found_fsns[item.title]:
+                    logger.warning("Outcome=SKIPPED reason=NO_FSN SKU=%s", sku)
+                else:
+                    accept(sku, found_fsns[item.title], item.suggested_price)
+            needs_fsn = unresolved
+
+    if len(seen_skus) >= MAX_CANDIDATES_PER_RUN:
+        logger.info("Reached %d listings for this run, leaving the rest for the next sync", MAX_CANDIDATES_PER_RUN)
+    elif needs_fsn:
+        logger.info("FSN search limit reached, leaving %d rows for the next sync", len(needs_fsn))
+
+    # Send in batches so one rejected request does not fail the whole run
+    for start in range(0, len(pending), LISTINGS_PER_REQUEST):
+        batch = pending[start:start + LISTINGS_PER_REQUEST]
+
+        try:
+            logger.info("Creating %d Makro listings...", len(batch))
+            result = makro_api.create_listings_bulk([payload for _, payload in batch]) or {}
+
+            # A 2xx only means the request was accepted; each record has its own status
+            records = {
+                record.get('sku_id'): record
+                for record in result.get('results', [])
+                if isinstance(record, dict)
+            }
+            created = {}
+            for sku, _ in batch:
+                record = records.get(sku)
+                if record and str(record.get('status', '')).upper() == 'SUCCESS':
+                    created[sku] = record.get('listing_id', 'unknown')
+                    logger.info("Outcome=CREATED SKU=%s listing_id=%s", sku, created[sku])
+                else:
+                    error = (record.get('errors') or record.get('message')) if record else 'no result returned'
+                    logger.error("Outcome=FAILED SKU=%s error=%s", sku, str(error)[:200])
+
+            logger.info("✅ Created %d of %d listings", len(created), len(batch))
+            if created:
+                review_queue.mark_as_listed(created)
+
+        except Exception as e:
+            logger.error("❌ Failed to create listings: %s", e)
+            for sku, _ in batch:
+                logger.error("Outcome=FAILED SKU=%s error=%s", sku, str(e)[:200])
+
+
+# Shared components, created on first use so repeated runs in one process
+# keep their caches and OAuth token
+_FSN_FINDER = None
+_REVIEW_QUEUE = None
+_MAKRO_API = None
+
+
+def get_fsn_finder():
+    global _FSN_FINDER
+    if _FSN_FINDER is None:
+        _FSN_FINDER = MakroFSNFinder()
+    return _FSN_FINDER
+
+
+def get_review_queue():
+    global _REVIEW_QUEUE
+    if _REVIEW_QUEUE is None:
+        _REVIEW_QUEUE = ReviewQueue(GOOGLE_SHEETS_CSV_URL)
+    return _REVIEW_QUEUE
+
+
+def get_makro_api():
+    """Return the shared Makro API client, or None without credentials"""
+    global _MAKRO_API
+    if _MAKRO_API is None and MAKRO_APP_ID and MAKRO_APP_SECRET:
+        try:
+            auth = MakroAuth(MAKRO_APP_ID, MAKRO_APP_SECRET)
+            _MAKRO_API = MakroApi(auth)
+            logger.info("Makro API initialized successfully")
+        except Exception as e:
+            logger.error("Failed to initialize Makro API: %s", e)
+    return _MAKRO_API
 
 
 def main():
     """Main entry point"""
     logger.info("=" * 60)
     logger.info("=== Starting Takealot-Makro Automation ===")
-    logger.info(f"Mode: {MODE}")
-    logger.info(f"DRY RUN: {DRY_RUN}")
-    logger.info(f"Google Sheets URL configured: {bool(GOOGLE_SHEETS_CSV_URL)}")
-    logger.info(f"Makro credentials configured: {bool(MAKRO_APP_ID and MAKRO_APP_SECRET)}")
+    logger.info("Mode: %s", MODE)
+    logger.info("DRY RUN: %s", DRY_RUN)
+    logger.info("Google Sheets URL configured: %s", bool(GOOGLE_SHEETS_CSV_URL))
+    logger.info("Makro credentials configured: %s", bool(MAKRO_APP_ID and MAKRO_APP_SECRET))
     logger.info("=" * 60)
 
     # Initialize components
-    fsn_finder = MakroFSNFinder()
-    review_queue = ReviewQueue(GOOGLE_SHEETS_CSV_URL)
+    fsn_finder = get_fsn_finder()
+    review_queue = get_review_queue()
     takealot_scraper = TakealotScraper()
 
-    # Initialize Makro API if credentials provided
-    makro_api = None
-    if MAKRO_APP_ID and MAKRO_APP_SECRET:
-        try:
-            auth = MakroAuth(MAKRO_APP_ID, MAKRO_APP_SECRET)
-            makro_api = MakroApi(auth)
-            logger.info("Makro API initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize Makro API: {e}")
-    else:
+    makro_api = get_makro_api()
+    if not (MAKRO_APP_ID and MAKRO_APP_SECRET):
         logger.warning("Makro API credentials not provided")
 
     # Run based on MODE
     if MODE == 'ingest':
         ingest_mode(makro_api, takealot_scraper)
     elif MODE == 'activate':
+        # Handshake with Makro while the review sheet is downloading
+        if PREWARM:
+            hosts = [MAKRO_SEARCH_URL] + ([MAKRO_API_BASE_URL] if makro_api and not DRY_RUN else [])
+            prewarm_connections([requests.compat.urljoin(url, '/') for url in hosts])
         activate_mode(makro_api, review_queue, takealot_scraper, fsn_finder)
     else:
-        logger.error(f"Unknown MODE: {MODE}")
+        logger.error("Unknown MODE: %s", MODE)
 
     logger.info("=" * 60)
     logger.info("=== Finished ===")
     logger.info("=" * 60)
 
 
+def run_scheduled():
+    """Run main() every SYNC_INTERVAL_MINUTES, sleeping until the next run"""
+    logger.info("Scheduled mode: running every %s minutes", SYNC_INTERVAL_MINUTES)
+    interval = SYNC_INTERVAL_MINUTES * 60
+    next_run = time.monotonic()
+
+    while True:
+        try:
+            main()
+        except Exception as e:
+            logger.error("Scheduled run failed: %s", e)
+
+        # Sleep until the next slot so run time does not push the schedule back;
+        # a run that overran its slot starts the next one immediately
+        next_run = max(next_run + interval, time.monotonic())
+        time.sleep(max(0, next_run - time.monotonic()))
+
+
 if __name__ == "__main__":
-    main()
+    if RUN_MODE == 'scheduled':
+        run_scheduled()
+    else:
+        main()
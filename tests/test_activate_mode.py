@@ -0,0 +1,110 @@
+import logging
+import unittest
+from unittest import mock
+
+import main
+from main import ApprovedItem
+
+
+class FakeSearchPage:
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+class FakeReviewQueue:
+    def __init__(self, items):
+        self.items = items
+        self.listed = set()
+
+    def get_approved_items(self):
+        return [item for item in self.items if item.takealot_sku not in self.listed]
+
+    def mark_as_listed(self, listings):
+        self.listed.update(listings)
+
+
+class FakeMakroApi:
+    def create_listings_bulk(self, payloads):
+        return {'results': [
+            {'sku_id': record['sku_id'], 'status': 'SUCCESS', 'listing_id': f"L-{record['sku_id']}"}
+            for payload in payloads
+            for record in payload['listing_records']
+        ]}
+
+
+def row(sku, title, fsn='', price=999.0):
+    return ApprovedItem(takealot_sku=sku, fsn=fsn, title=title, takealot_price=100.0,
+                        suggested_price=price, margin=30.0)
+
+
+@mock.patch.object(main, 'DRY_RUN', False)
+@mock.patch.object(main, 'MAX_CANDIDATES_PER_RUN', 10)
+class ActivateModeCapTest(unittest.TestCase):
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.searches = []
+
+        def fake_get(url, params=None, **kwargs):
+            self.searches.append(params['q'])
+            if params['q'] == 'findable kettle':
+                return FakeSearchPage(b'<a href="/p?pid=KTLFINDABLE0001&x=1">')
+            return FakeSearchPage(b'<html>no results</html>')
+
+        patcher = mock.patch.object(main.SESSION, 'get', side_effect=fake_get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_syncs(self, queue, runs):
+        finder = main.MakroFSNFinder()
+        for _ in range(runs):
+            main.activate_mode(FakeMakroApi(), queue, None, finder)
+
+    def test_unfindable_titles_do_not_starve_later_rows(self):
+        items = [row(f'MISS{i}', f'Unknown Gadget {i}') for i in range(30)]
+        items += [row(f'SHEET{i}', f'Listed Item {i}', fsn=f'FSNSHEET0000{i}') for i in range(5)]
+        items.append(row('FIND', 'Findable Kettle'))
+        queue = FakeReviewQueue(items)
+
+        self.run_syncs(queue, runs=3)
+
+        self.assertIn('FIND', queue.listed)
+        self.assertEqual({f'SHEET{i}' for i in range(5)} | {'FIND'}, queue.listed)
+        # Each title is searched once; cached misses are not fetched again
+        self.assertEqual(31, len(self.searches))
+        self.assertEqual(31, len(set(self.searches)))
+
+    def test_full_run_of_sheet_fsns_makes_no_searches(self):
+        items = [row(f'MISS{i}', f'Unknown Gadget {i}') for i in range(5)]
+        items += [row(f'SHEET{i}', f'Listed Item {i}', fsn=f'FSNSHEET000{i:02d}') for i in range(12)]
+        queue = FakeReviewQueue(items)
+
+        self.run_syncs(queue, runs=1)
+
+        self.assertEqual(10, len(queue.listed))
+        self.assertEqual([], self.searches)
+
+    def test_invalid_prices_do_not_use_up_the_cap(self):
+        items = [row(f'BAD{i}', f'Broken Row {i}', fsn='FSNBROKEN000001', price=0) for i in range(12)]
+        items.append(row('GOOD', 'Good Row', fsn='FSNGOOD00000001'))
+        queue = FakeReviewQueue(items)
+
+        self.run_syncs(queue, runs=1)
+
+        self.assertEqual({'GOOD'}, queue.listed)
+
+
+if __name__ == '__main__':
+    unittest.main()